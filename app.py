@@ -1,17 +1,77 @@
 import streamlit as st
 import re
+import io
 import json
+from collections import Counter
+from functools import lru_cache
 import pandas as pd
 
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib parser
+    orjson = None
+
 # Load Ghana ISO8583 spec JSON
-with open("iso8583_ghana_only.json") as f:
-    spec = json.load(f)
+@st.cache_resource
+def load_spec():
+    """Parse the spec once per process; Streamlit reruns reuse the same (read-only) object."""
+    with open("iso8583_ghana_only.json", "rb") as f:
+        return orjson.loads(f.read()) if orjson else json.load(f)
+
+spec = load_spec()
 data_elements = spec["data_elements"]
 
+# Per-field rules, pre-extracted so validate_field does a single dict lookup:
+# (mandatory for all MTIs, MTIs where mandatory, fixed length or -1, format code)
+FMT_OTHER, FMT_NUMERIC, FMT_ALNUM = 0, 1, 2
+
+def _field_rule(rule):
+    usage = rule.get("Usage", {})
+    length = rule["Length"]
+    return (
+        usage.get("all") == "M",
+        frozenset(key for key, flag in usage.items() if flag == "M"),
+        int(length) if length.isdigit() else -1,
+        {"n": FMT_NUMERIC, "an": FMT_ALNUM}.get(rule["Format"], FMT_OTHER),
+    )
+
+field_rules = {field_num: _field_rule(rule) for field_num, rule in data_elements.items()}
+
+# MTI and response-code sets used by the validators
+SKIP_MTIS = frozenset({"0800", "0810", "0820"})          # network management, not validated
+VISA_APPROVAL_MTIS = frozenset({"0210", "0230", "0430"})  # Visa responses that carry DE 38
+MC_RESP_MTIS = frozenset({"0210", "0110", "0430"})        # Mastercard responses that carry DE 126
+VALID_RC = frozenset({"00", "01", "02"})
+
+# Mandatory-field index, built once at load: fields that are M for every MTI,
+# and for each MTI its full mandatory list (spec order preserved)
+spec_mtis = {key for rule in data_elements.values() for key in rule.get("Usage", {}) if key != "all"}
+mandatory_all = tuple(
+    field_num for field_num, rule in data_elements.items()
+    if rule.get("Usage", {}).get("all") == "M"
+)
+mandatory_by_mti = {
+    mti: tuple(
+        field_num for field_num, rule in data_elements.items()
+        if rule.get("Usage", {}).get("all") == "M" or rule.get("Usage", {}).get(mti) == "M"
+    )
+    for mti in spec_mtis
+}
+
 # Regex patterns
-fld_pattern = re.compile(r"FLD\s*\((\d+)\)\s*(?::|\s*)\s*\((\d+|LLVAR)\)\s*(?::|\s*)\s*\[(.*?)\]")
-nested_start_pattern = re.compile(r"FLD\s*\((\d+)\)\s*(?::|\s*)\s*\((\d+|LLVAR)\)")
-nested_line_pattern = re.compile(r"\((.*?)\).*?(?::|\s*)\s*\[(.*?)\]")
+# Lines are dispatched in a fixed order (MTI, nested start, nested line, field);
+# each pattern only runs once the cheap substring gates for its step have passed.
+mti_pattern = re.compile(r"\[(\d+)\]")
+nested_gate = re.compile(r"FLD \((?:055|062|063)\)")
+nested_start_pattern = re.compile(r"FLD\s*\((\d+)\)\s*(?::\s*)?\((\d+|LLVAR)\)")
+fld_pattern = re.compile(r"FLD\s*\((\d+)\)\s*(?::\s*)?\((\d+|LLVAR)\)\s*(?::\s*)?\[([^\]]*)\]")
+
+# Field number as written (1-3 digits, zero-padded or not) -> normalised key ("055" -> "55");
+# str(int()) covers anything else
+field_num_norm = {str(i).zfill(n): str(i) for i in range(1000) for n in (1, 2, 3)}
+
+# Deletes everything except ASCII 0-9 (DE 12/13 clean-up)
+non_digit_pattern = re.compile(r"[^0-9]")
 
 def detect_scheme(fields):
     """Detect whether the trace belongs to Visa or Mastercard."""
@@ -19,117 +79,380 @@ def detect_scheme(fields):
         return "Mastercard"
     return "Visa"
 
-def validate_field(field_num, length, value, mti, scheme, field_values=None):
-    rule = data_elements.get(field_num)
-    if not rule:
-        return None
-    usage = rule.get("Usage", {})
-    if usage.get("all") == "M" or usage.get(mti) == "M":
-        if not value:
-            return f"Missing mandatory field {field_num}"
+# Special case: DE 42 — Card Acceptor ID
+def _v42(value, mti, scheme, field_values):
+    if not value:
+        return "Missing mandatory field 42"
+    return None
 
-    # Special case: DE 42 — Card Acceptor ID
-    if field_num == "42":
-        if not value.strip():
-            return f"Missing mandatory field {field_num}"
-        return None
+# Special case: DE 12 — Local Transaction Time (hhmmss)
+def _v12(value, mti, scheme, field_values):
+    clean_value = non_digit_pattern.sub("", value)[-6:]  # take last 6 digits
+    if len(clean_value) != 6:  # only ASCII digits survive the clean-up
+        return f"Invalid length: expected 6, got {len(clean_value)} (raw {value})"
+    return None
 
-    # Special case: DE 12 — Local Transaction Time (hhmmss)
-    if field_num == "12":
-        clean_value = re.sub(r"\D", "", value)[-6:]  # take last 6 digits
-        if not clean_value.isdigit() or len(clean_value) != 6:
-            return f"Invalid length: expected 6, got {len(clean_value)} (raw {value})"
-        return None
+# Special case: DE 13 — Local Transaction Date (MMDD)
+def _v13(value, mti, scheme, field_values):
+    clean_value = non_digit_pattern.sub("", value)[-4:]  # take last 4 digits
+    if len(clean_value) != 4:  # only ASCII digits survive the clean-up
+        return f"Invalid length: expected 4, got {len(clean_value)} (raw {value})"
+    return None
 
-    # Special case: DE 13 — Local Transaction Date (MMDD)
-    if field_num == "13":
-        clean_value = re.sub(r"\D", "", value)[-4:]  # take last 4 digits
-        if not clean_value.isdigit() or len(clean_value) != 4:
-            return f"Invalid length: expected 4, got {len(clean_value)} (raw {value})"
-        return None
+# Special case: DE 22 — POS Entry Mode (accept 3 or 4 digits)
+def _v22(value, mti, scheme, field_values):
+    clean_value = value[:4]  # take first 3–4 digits
+    if not (clean_value.isascii() and clean_value.isdigit()) or len(clean_value) not in (3, 4):
+        return f"Invalid length: expected 3 or 4, got {len(clean_value)} (raw {value})"
+    return None
 
-    # Special case: DE 22 — POS Entry Mode (accept 3 or 4 digits)
-    if field_num == "22":
-        clean_value = value.strip()[:4]  # take first 3–4 digits
-        if not clean_value.isdigit() or len(clean_value) not in (3, 4):
-            return f"Invalid length: expected 3 or 4, got {len(clean_value)} (raw {value})"
-        return None
+# Special case: DE 25 — POS Condition Code (2 digits, pad if needed)
+def _v25(value, mti, scheme, field_values):
+    clean_value = value[:2]  # take first 2 digits
+    if len(clean_value) == 1:
+        clean_value = clean_value.zfill(2)
+    if not (clean_value.isascii() and clean_value.isdigit()) or len(clean_value) != 2:
+        return f"Invalid format/length: expected 2 digits, got {value}"
+    return None
 
-    # Special case: DE 25 — POS Condition Code (2 digits, pad if needed)
-    if field_num == "25":
-        clean_value = value.strip()[:2]  # take first 2 digits
-        if len(clean_value) == 1:
-            clean_value = clean_value.zfill(2)
-        if not clean_value.isdigit() or len(clean_value) != 2:
-            return f"Invalid format/length: expected 2 digits, got {value}"
+# Special case: DE 38 — Authorization Identification Response
+def _v38(value, mti, scheme, field_values):
+    if scheme == "Visa":
+        rc = None
+        if field_values and "39" in field_values:
+            rc = field_values["39"]
+        # Visa: mandatory only if approved response
+        if mti in VISA_APPROVAL_MTIS and rc == "00":
+            if not value or len(value) != 6 or not (value.isascii() and value.isalnum()):
+                return f"Invalid DE 38 for Visa: must be 6 alphanumeric chars in approved responses (raw {value})"
+        # Declines may omit DE 38 → no error
         return None
-
-    # Special case: DE 38 — Authorization Identification Response
-    if field_num == "38":
-        if scheme == "Visa":
-            rc = None
-            if field_values and "39" in field_values:
-                rc = field_values["39"]
-            # Visa: mandatory only if approved response
-            if mti in ["0210", "0230", "0430"] and rc == "00":
-                if not value or len(value) != 6 or not value.isalnum():
-                    return f"Invalid DE 38 for Visa: must be 6 alphanumeric chars in approved responses (raw {value})"
-            # Declines may omit DE 38 → no error
-            return None
-        elif scheme == "Mastercard":
-            # Mastercard: mandatory in all responses
-            if not value or len(value) != 6:
-                return f"Invalid DE 38 for Mastercard: must be 6 chars (raw {value})"
-            if not value.isalnum():
-                return f"Invalid DE 38 for Mastercard: must be alphanumeric/numeric (raw {value})"
-            return None
-
-    # Special case: DE 100 — Receiving Institution Identification Code
-    if field_num == "100":
-        if not value.strip():
-            return "Missing mandatory field 100"
-        if not value.isalnum():
-            return "Invalid format: expected alphanumeric"
-        if len(value) > 15:
-            return f"Invalid length: expected up to 15, got {len(value)}"
+    elif scheme == "Mastercard":
+        # Mastercard: mandatory in all responses
+        if not value or len(value) != 6:
+            return f"Invalid DE 38 for Mastercard: must be 6 chars (raw {value})"
+        if not (value.isascii() and value.isalnum()):
+            return f"Invalid DE 38 for Mastercard: must be alphanumeric/numeric (raw {value})"
         return None
+    # Unknown scheme: fall back to the spec rule
+    return spec_validators["38"](value, mti, scheme, field_values)
+
+# Special case: DE 100 — Receiving Institution Identification Code
+def _v100(value, mti, scheme, field_values):
+    if not value:
+        return "Missing mandatory field 100"
+    if not (value.isascii() and value.isalnum()):
+        return "Invalid format: expected alphanumeric"
+    if len(value) > 15:
+        return f"Invalid length: expected up to 15, got {len(value)}"
+    return None
+
+# Generic validation from the spec's Length/Format, specialised per DE at load time
+def _spec_validator(expected_length, fmt_code):
+    """Validator for one DE's spec Length/Format, with the rule folded into a closure."""
+    is_valid_format = {FMT_NUMERIC: str.isdigit, FMT_ALNUM: str.isalnum}.get(fmt_code)
+    format_error = f"Invalid format: expected {'numeric' if fmt_code == FMT_NUMERIC else 'alphanumeric'}"
 
-    # Generic validation
-    expected_length = rule["Length"]
-    if expected_length.isdigit():
-        if len(value) != int(expected_length):
+    def validate(value, mti, scheme, field_values):
+        if expected_length >= 0 and len(value) != expected_length:
             return f"Invalid length: expected {expected_length}, got {len(value)}"
-    fmt = rule["Format"]
-    if fmt == "n" and not value.isdigit():
-        return f"Invalid format: expected numeric"
-    if fmt == "an" and not value.isalnum():
-        return f"Invalid format: expected alphanumeric"
-    if field_num == "39":
-        if value not in ["00", "01", "02"]:
-            return f"Invalid response code: {value}"
+        if is_valid_format and not (value.isascii() and is_valid_format(value)):
+            return format_error
+        return None
+    return validate
+
+spec_validators = {
+    field_num: _spec_validator(expected_length, fmt_code)
+    for field_num, (_, _, expected_length, fmt_code) in field_rules.items()
+}
+
+# Special case: DE 39 — Response Code, spec checks plus the accepted codes
+def _v39(value, mti, scheme, field_values):
+    issue = spec_validators["39"](value, mti, scheme, field_values)
+    if issue:
+        return issue
+    if value not in VALID_RC:
+        return f"Invalid response code: {value}"
     return None
 
-def get_mandatory_fields(mti, scheme, field_values=None):
+# Field-specific validators, taking precedence over the spec rule; every other
+# DE is checked against its spec rule only
+field_validators = {
+    **spec_validators,
+    "12": _v12,
+    "13": _v13,
+    "22": _v22,
+    "25": _v25,
+    "38": _v38,
+    "39": _v39,
+    "42": _v42,
+    "100": _v100,
+}
+
+def validate_field(field_num, value, mti, scheme, field_values=None):
+    rule = field_rules.get(field_num)
+    if not rule:
+        return None
+    usage_all, usage_mtis = rule[:2]
+    if usage_all or mti in usage_mtis:
+        if not value:
+            return f"Missing mandatory field {field_num}"
+
+    return field_validators[field_num](value, mti, scheme, field_values)
+
+@lru_cache(maxsize=None)
+def _mandatory(mti, scheme, rc_is_approved):
+    """Mandatory fields for an (MTI, scheme, approved) combination, computed once."""
     mandatory = []
-    for field_num, rule in data_elements.items():
-        usage = rule.get("Usage", {})
-        if usage.get("all") == "M" or usage.get(mti) == "M":
-            # Special rule: DE 126 only mandatory for Mastercard response MTIs
-            if field_num == "126" and mti not in ["0210", "0110", "0430"]:
-                continue
-
-            # Special rule: DE 38 (Authorization Identification Response)
-            if field_num == "38":
-                if scheme == "Visa":
-                    # Visa: mandatory only if approved response (RC=00)
-                    rc = field_values.get("39") if field_values else None
-                    if rc != "00":
-                        continue  # skip DE 38 for Visa declines
-                elif scheme == "Mastercard":
-                    # Mastercard: mandatory in all responses
-                    pass  # always include
-            mandatory.append(field_num)
-    return mandatory
+    for field_num in mandatory_by_mti.get(mti, mandatory_all):
+        # Special rule: DE 126 only mandatory for Mastercard response MTIs
+        if field_num == "126" and mti not in MC_RESP_MTIS:
+            continue
+
+        # Special rule: DE 38 (Authorization Identification Response)
+        if field_num == "38":
+            if scheme == "Visa":
+                # Visa: mandatory only if approved response (RC=00)
+                if not rc_is_approved:
+                    continue  # skip DE 38 for Visa declines
+            elif scheme == "Mastercard":
+                # Mastercard: mandatory in all responses
+                pass  # always include
+        mandatory.append(field_num)
+    return tuple(mandatory)
+
+def get_mandatory_fields(mti, scheme, field_values, include_missing=False):
+    """Mandatory fields for this message; absent ones only with include_missing."""
+    rc = field_values.get("39") if field_values else None
+    mandatory = _mandatory(mti, scheme, rc == "00")
+    if include_missing:
+        return mandatory  # the cached tuple itself, no copy
+    # Only the mandatory fields actually present in the message
+    return tuple(f for f in mandatory if f in field_values)
+
+def iter_messages(lines):
+    """Parse trace lines, yielding each {"mti", "fields"} message once it is complete."""
+    current_message = None
+    nested_field = None
+    nested_data = {}
+    # Always go through the precompiled patterns' bound methods, never
+    # re.search(pattern_str, ...), which pays a re-module cache lookup per line.
+    mti_search = mti_pattern.search
+    nested_gate_search = nested_gate.search
+    nested_start_search = nested_start_pattern.search
+    fld_search = fld_pattern.search
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        # Start of new message
+        if "M.T.I" in line:
+            m = mti_search(line)
+            if m:
+                if current_message:
+                    yield current_message
+                current_mti = m.group(1)
+                current_message = {"mti": current_mti, "fields": {}}
+                current_message["fields"]["MTI"] = current_mti
+                nested_field = None
+                nested_data = {}
+            continue
+
+        # If we are inside a message, capture fields
+        if not current_message:
+            continue
+        has_fld = "FLD" in line
+
+        # Nested field start
+        if has_fld and nested_gate_search(line):
+            m = nested_start_search(line)
+            if m:
+                nested_field = field_num_norm.get(m.group(1)) or str(int(m.group(1)))
+                nested_data = {}
+                current_message["fields"][nested_field] = nested_data
+            continue
+
+        # Nested line "> (TAG) name: [VALUE]": split with str.partition, which
+        # finds the same first "(", ")", "[", "]" as a lazy regex would
+        is_sub = line[0] == ">"
+        if nested_field and is_sub:
+            _, paren, rest = line.partition("(")
+            tag, close, rest = rest.partition(")")
+            _, bracket, rest = rest.partition("[")
+            tag_val, end, _ = rest.partition("]")
+            if paren and close and bracket and end:
+                nested_data[tag.strip()] = tag_val.strip()
+            continue
+
+        # Lines without FLD can't hold a field; blank lines, headers and
+        # timestamps stop here without reaching the regex engine
+        if not has_fld:
+            continue
+
+        # Reset nested field when next FLD starts
+        if not is_sub:
+            nested_field = None
+
+        # Regular field. A match has to end at a "]", so search only up to the
+        # last one: a candidate FLD whose "[" is never closed then fails at once
+        # instead of scanning to the end of the line, keeping long malformed
+        # lines linear
+        close = line.rfind("]")
+        m = fld_search(line, 0, close + 1) if close >= 0 else None
+        if m:
+            field_num = m.group(1)
+            normalized = field_num_norm.get(field_num) or str(int(field_num))
+            current_message["fields"][normalized] = m.group(3).strip()
+    if current_message:
+        yield current_message
+
+SUMMARY_COLUMNS = ["Message", "MTI", "Scheme", "Mandatory", "Available", "Missing", "Passed", "Failed"]
+
+def validate_message(msg):
+    """Validate one transactional message; returns its summary row and its table columns."""
+    mti = msg["mti"]
+    field_values = msg["fields"]
+
+    scheme = detect_scheme(field_values)
+
+    # Absent mandatory fields are kept so they are reported as failures
+    mandatory_fields = get_mandatory_fields(mti, scheme, field_values, include_missing=True)
+    fields, values, validations, passed = [], [], [], []
+    passed_count, failed_count = 0, 0
+    available_count, missing_count = 0, 0
+
+    for f in mandatory_fields:
+        value = field_values.get(f)
+        fields.append(f"DE {f}")
+
+        if isinstance(value, dict):
+            values.append(f"{len(value)} nested items")
+            validations.append("✅ Nested field captured")
+            passed.append(True)
+            passed_count += 1
+            available_count += 1
+        elif value:
+            available_count += 1
+            values.append(value)
+            issue = validate_field(f, value, mti, scheme)
+            if not issue:
+                validations.append("✅ Passed")
+                passed.append(True)
+                passed_count += 1
+            else:
+                validations.append(f"❌ {issue}")
+                passed.append(False)
+                failed_count += 1
+        else:
+            missing_count += 1
+            values.append("❌ Missing")
+            validations.append("❌ Missing mandatory field")
+            passed.append(False)
+            failed_count += 1
+
+    # Summary row in SUMMARY_COLUMNS order, less the message number
+    return (mti, scheme, len(mandatory_fields), available_count, missing_count,
+            passed_count, failed_count), (fields, values, validations, passed)
+
+def decode_line(line):
+    """Decode one trace line as UTF-8, falling back to latin-1."""
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError:
+        return line.decode("latin-1")
+
+@st.cache_data
+def validate_trace(data):
+    """Parse and validate a trace in a single streaming pass over its messages."""
+    # Decode the whole upload once; only if that fails fall back line by line, so
+    # one bad byte doesn't turn every UTF-8 line into latin-1. Lines are read
+    # lazily and split on "\n" only: str.splitlines() would also break on
+    # FS/GS/RS, \x85 etc. inside field values
+    try:
+        lines = io.StringIO(data.decode("utf-8"), newline="\n")
+    except UnicodeDecodeError:
+        lines = (decode_line(line) for line in io.BytesIO(data))
+
+    # Each message is validated as soon as it is parsed, then dropped; only the
+    # counts, summaries and validation rows are kept
+    mti_counts = Counter()
+    summary = []
+    details = {"Message": [], "MTI": [], "Scheme": [], "Field": [], "Value": [], "Validation": [], "OK": []}
+    for i, msg in enumerate(iter_messages(lines), 1):
+        mti_counts[msg["mti"]] += 1
+        if msg["mti"] in SKIP_MTIS:
+            continue
+        row, (fields, values, validations, passed) = validate_message(msg)
+        mti, scheme = row[:2]
+
+        # One summary row and the validation rows for every message go into two
+        # frames, each built once per file
+        summary.append((i, *row))
+
+        n = len(fields)
+        details["Message"] += [i] * n
+        details["MTI"] += [mti] * n
+        details["Scheme"] += [scheme] * n
+        details["Field"] += fields
+        details["Value"] += values
+        details["Validation"] += validations
+        details["OK"] += passed
+    return mti_counts, pd.DataFrame(summary, columns=SUMMARY_COLUMNS), pd.DataFrame(details)
+
+@st.fragment
+def render_results(file_name, mti_counts, summary, details):
+    """MTI filter and validation output for one file; the filter reruns only this fragment."""
+    # Multi-select filter (widget → needs key)
+    mti_options = sorted(mti_counts.keys())
+    selected_mtis = st.multiselect(
+        "Select one or more MTIs to view",
+        mti_options,
+        default=mti_options,
+        key=f"mtiselect_{file_name}"
+    )
+
+    # Validation phase: one summary table and one validation table per file,
+    # filtered from the cached frames; with every MTI selected (the default)
+    # the frames are used as is
+    selected = set(selected_mtis)
+    if selected >= mti_counts.keys():
+        df_summary, df_mandatory = summary, details
+    else:
+        df_summary = summary[summary["MTI"].isin(selected)]
+        df_mandatory = details[details["MTI"].isin(selected)]
+
+    # Network-management MTIs never reach the summary (SKIP_MTIS is applied
+    # while parsing), so every row is a transactional message
+    total_mtis = len(df_summary)
+    mtis_with_errors = int((df_summary["Failed"] > 0).sum())
+    mtis_clean = total_mtis - mtis_with_errors
+
+    st.write("### Message Summaries")
+    st.dataframe(df_summary, hide_index=True, key=f"summary_{file_name}")
+
+    # Filter or sort on the Message column to inspect a single message
+    st.write("### Mandatory Field Validation")
+    # No Styler: pass/fail is a boolean column recorded during validation, so
+    # the frame goes to the grid as is
+    st.dataframe(
+        df_mandatory,
+        column_config={
+            "Validation": st.column_config.TextColumn("Validation", width="large"),
+            "OK": st.column_config.CheckboxColumn("OK"),
+        },
+        hide_index=True,
+        key=f"mandatory_{file_name}"
+    )
+
+    # --- Global summary for filtered MTIs ---
+    st.write("---")
+    st.success(
+        f"Global Summary (Filtered): {total_mtis} transactional messages — "
+        f"{mtis_clean} clean, {mtis_with_errors} with errors"
+    )
+
 st.title("VISA and MasterCard Trace Validator")
 
 uploaded_files = st.file_uploader("Upload one or more trace files", accept_multiple_files=True)
@@ -139,162 +462,12 @@ if uploaded_files:
         # Display only (no key allowed here)
         st.subheader(f"Results for {uploaded_file.name}")
 
-        messages = []
-        current_message = None
-        nested_field = None
-        nested_data = {}
-
-        for line_num, line in enumerate(uploaded_file, 1):
-            try:
-                line = line.decode("utf-8")
-            except UnicodeDecodeError:
-                line = line.decode("latin-1")
-            line = line.strip()
-
-            # Start of new message
-            if "M.T.I" in line:
-                mti_match = re.search(r"\[(\d+)\]", line)
-                if mti_match:
-                    current_mti = mti_match.group(1)
-                    current_message = {"mti": current_mti, "fields": {}}
-                    current_message["fields"]["MTI"] = current_mti
-                    messages.append(current_message)
-                    nested_field = None
-                    nested_data = {}
-                continue
-
-            # If we are inside a message, capture fields
-            if current_message:
-                # Nested field start
-                if "FLD (055)" in line or "FLD (062)" in line or "FLD (063)" in line:
-                    fld_match = nested_start_pattern.search(line)
-                    if fld_match:
-                        nested_field = str(int(fld_match.group(1)))
-                        nested_data = {}
-                        current_message["fields"][nested_field] = nested_data
-                    continue
-
-                # Nested line
-                if nested_field and line.startswith(">"):
-                    tag_match = nested_line_pattern.search(line)
-                    if tag_match:
-                        tag, value = tag_match.groups()
-                        nested_data[tag.strip()] = value.strip()
-                    continue
-
-                # Reset nested field when next FLD starts
-                if "FLD" in line and not line.startswith(">"):
-                    nested_field = None
-
-                # Regular field
-                match = fld_pattern.search(line)
-                if match:
-                    field_num, length, value = match.groups()
-                    normalized = str(int(field_num))
-                    current_message["fields"][normalized] = value.strip()
-
-        # MTI counts
-        mti_counts = {}
-        for msg in messages:
-            mti = msg["mti"]
-            mti_counts[mti] = mti_counts.get(mti, 0) + 1
+        # Parsing and validation are cached on the file bytes, so widget
+        # interactions only re-render
+        mti_counts, summary, details = validate_trace(uploaded_file.getvalue())
 
         st.write("### MTI Counts in File")
         df_counts = pd.DataFrame(list(mti_counts.items()), columns=["MTI", "Count"])
         st.dataframe(df_counts, key=f"counts_{uploaded_file.name}")
 
-        # Multi-select filter (widget → needs key)
-        mti_options = sorted(mti_counts.keys())
-        selected_mtis = st.multiselect(
-            "Select one or more MTIs to view",
-            mti_options,
-            default=mti_options,
-            key=f"mtiselect_{uploaded_file.name}"
-        )
-
-        filtered_messages = [msg for msg in messages if msg["mti"] in selected_mtis]
-
-        # Validation phase
-        total_mtis = 0
-        mtis_with_errors = 0
-        mtis_clean = 0
-        for i, msg in enumerate(filtered_messages, 1):
-            mti = msg["mti"]
-            field_values = msg["fields"]
-
-            if mti in ["0800", "0810", "0820"]:
-                continue
-
-            scheme = detect_scheme(field_values)
-
-            total_mtis += 1
-            st.write(f"### Message {i} (MTI {mti}, Scheme {scheme}) Validation")
-            mandatory_fields = get_mandatory_fields(mti, scheme, field_values)
-            mandatory_fields = [f for f in mandatory_fields if f in field_values]
-            mandatory_data = []
-            passed_count, failed_count = 0, 0
-            available_count, missing_count = 0, 0
-            errors = []
-
-            for f in mandatory_fields:
-                value = field_values.get(f)
-
-                if isinstance(value, dict):
-                    display_value = f"{len(value)} nested items"
-                    mandatory_data.append({"Field": f"DE {f}", "Value": display_value, "Validation": "✅ Nested field captured"})
-                    passed_count += 1
-                    available_count += 1
-                elif value:
-                    available_count += 1
-                    issue = validate_field(f, str(len(value)), value, mti, scheme)
-                    if not issue:
-                        mandatory_data.append({"Field": f"DE {f}", "Value": value, "Validation": "✅ Passed"})
-                        passed_count += 1
-                    else:
-                        mandatory_data.append({"Field": f"DE {f}", "Value": value, "Validation": f"❌ {issue}"})
-                        failed_count += 1
-                        errors.append({"Field": f, "Value": value, "Issue": issue})
-                else:
-                    missing_count += 1
-                    mandatory_data.append({
-                        "Field": f"DE {f}",
-                        "Value": "❌ Missing",
-                        "Validation": "❌ Missing mandatory field"
-                    })
-                    failed_count += 1
-                    errors.append({
-                        "Field": f,
-                        "Value": "❌ Missing",
-                        "Issue": "Missing mandatory field"
-                    })
-
-            st.info(
-                f"Summary for Message {i} (MTI {mti}, Scheme {scheme}): {len(mandatory_fields)} mandatory fields — "
-                f"{available_count} available, {missing_count} missing; "
-                f"{passed_count} passed, {failed_count} failed"
-            )
-
-            if failed_count > 0:
-                mtis_with_errors += 1
-            else:
-                mtis_clean += 1
-
-            df_mandatory = pd.DataFrame(mandatory_data)
-
-            def highlight_validation(val):
-                if "✅" in val:
-                    return "background-color: #d4edda; color: #155724"
-                else:
-                    return "background-color: #f8d7da; color: #721c24"
-
-            st.dataframe(
-                df_mandatory.style.map(highlight_validation, subset=["Validation"]),
-                key=f"mandatory_{uploaded_file.name}_{i}"
-            )
-
-        # --- Global summary for filtered MTIs ---
-        st.write("---")
-        st.success(
-            f"Global Summary (Filtered): {total_mtis} transactional messages — "
-            f"{mtis_clean} clean, {mtis_with_errors} with errors"
-        )
\ No newline at end of file
+        render_results(uploaded_file.name, mti_counts, summary, details)
\ No newline at end of file
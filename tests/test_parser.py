@@ -0,0 +1,134 @@
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)  # app.py loads the spec by relative path
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+
+
+# The original sequential parser (one re.search per step, in this order),
+# kept as the reference the optimised iter_messages must agree with
+fld_pattern = re.compile(r"FLD\s*\((\d+)\)\s*(?::|\s*)\s*\((\d+|LLVAR)\)\s*(?::|\s*)\s*\[(.*?)\]")
+nested_start_pattern = re.compile(r"FLD\s*\((\d+)\)\s*(?::|\s*)\s*\((\d+|LLVAR)\)")
+nested_line_pattern = re.compile(r"\((.*?)\).*?(?::|\s*)\s*\[(.*?)\]")
+
+
+def baseline_messages(lines):
+    messages = []
+    current_message = None
+    nested_field = None
+    nested_data = {}
+    for line in lines:
+        line = line.strip()
+        if "M.T.I" in line:
+            mti_match = re.search(r"\[(\d+)\]", line)
+            if mti_match:
+                current_mti = mti_match.group(1)
+                current_message = {"mti": current_mti, "fields": {}}
+                current_message["fields"]["MTI"] = current_mti
+                messages.append(current_message)
+                nested_field = None
+                nested_data = {}
+            continue
+        if current_message:
+            if "FLD (055)" in line or "FLD (062)" in line or "FLD (063)" in line:
+                fld_match = nested_start_pattern.search(line)
+                if fld_match:
+                    nested_field = str(int(fld_match.group(1)))
+                    nested_data = {}
+                    current_message["fields"][nested_field] = nested_data
+                continue
+            if nested_field and line.startswith(">"):
+                tag_match = nested_line_pattern.search(line)
+                if tag_match:
+                    tag, value = tag_match.groups()
+                    nested_data[tag.strip()] = value.strip()
+                continue
+            if "FLD" in line and not line.startswith(">"):
+                nested_field = None
+            match = fld_pattern.search(line)
+            if match:
+                field_num, length, value = match.groups()
+                current_message["fields"][str(int(field_num))] = value.strip()
+    return messages
+
+
+def parse(lines):
+    return list(app.iter_messages(lines))
+
+
+def check(lines):
+    assert parse(lines) == baseline_messages(lines)
+
+
+def test_fld_line_inside_nested_block_keeps_nested_tags():
+    lines = [
+        "M.T.I : [0100]",
+        "FLD (055) (LLVAR)",
+        "> (9F26) Cryptogram : [x]",
+        "> FLD (004) (012) [1]",
+        "> (9F27) CID : [z]",
+    ]
+    check(lines)
+    fields = parse(lines)[0]["fields"]
+    assert fields["55"]["9F26"] == "x" and fields["55"]["9F27"] == "z"
+    assert "4" not in fields
+
+
+def test_fld_line_with_prompt_outside_nested_block_is_a_field():
+    lines = ["M.T.I : [0100]", "> FLD (004) (012) [000000001000]"]
+    check(lines)
+    assert parse(lines)[0]["fields"]["4"] == "000000001000"
+
+
+def test_nested_number_without_space_is_a_regular_field():
+    lines = ["M.T.I : [0100]", "FLD(055) (3) [abc]"]
+    check(lines)
+    assert parse(lines)[0]["fields"]["55"] == "abc"
+
+
+def test_nested_gate_later_in_line_opens_nested_field():
+    check(["M.T.I : [0100]", "FLD (002) (16) [1] FLD (055) (LLVAR)", "> (9F26) C : [x]"])
+
+
+def test_nested_line_edge_cases_match_baseline():
+    lines = ["M.T.I : [0100]", "FLD (055) (LLVAR)"] + [
+        "> (9F26) Cryptogram : [ABCDEF]",
+        "> (9F27)CID:[80]",
+        "> ((9F10)) nested parens : [v]",
+        "> (9F33) two values : [a] [b]",
+        "> (9F34) value with ] : [x]]",
+        "> [v] (9F35) bracket before tag",
+        "> (9F36) no value",
+        "> no tag : [v]",
+        ">",
+        "> (9F37) unicode : [\u00e9\x85]",
+    ]
+    check(lines)
+
+
+def test_fuzzed_lines_match_baseline():
+    tokens = ["FLD", "FLD ", "(", "055", "062", "002", ")", " (", "12", "LLVAR", ") ",
+              ":", " [", "]", "x", ">", " ", "M.T.I", "[0100]", "\t"]
+    rng = random.Random(0)
+    for _ in range(2000):
+        lines = ["M.T.I : [0200]"] + [
+            "".join(rng.choice(tokens) for _ in range(rng.randint(0, 12)))
+            for _ in range(rng.randint(1, 8))
+        ]
+        check(lines)
+
+
+def test_long_malformed_fld_lines_parse_in_linear_time():
+    # Unclosed "[" runs used to make fld_pattern rescan to the end of the line
+    # from every FLD, about 3 s per line at this size
+    for line in ["FLD (1) (2) [" * 6000, "> " + "FLD (1) (2) [" * 6000, "FLD (1)" + " " * 78000 + "x"]:
+        start = time.perf_counter()
+        parse(["M.T.I : [0100]", line])
+        assert time.perf_counter() - start < 0.5
+    check(["M.T.I : [0100]", "FLD (1) (2) [" * 200 + "]"])